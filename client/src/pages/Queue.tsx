@@ -9,6 +9,8 @@ interface QueueItem {
   channel_name: string | null;
   duration: number | null;
   thumbnail_url: string | null;
+  thumbnail_hash: string | null;
+  thumbnail_sizes: number[];
   status: string;
   file_path: string | null;
   error_message: string | null;
@@ -69,6 +71,10 @@ const Queue: React.FC = () => {
     return url.includes('instagram.com') && (url.includes('/reel') || url.includes('/p/') || url.includes('/reels/'));
   };
 
+  const thumbnailVariantUrl = (hash: string, width: number): string => {
+    return `http://localhost:3001/api/thumbnails/${hash}/${width}`;
+  };
+
   const formatDuration = (seconds: number | null): string => {
     if (!seconds) return 'Unknown';
     const hours = Math.floor(seconds / 3600);
@@ -154,7 +160,28 @@ const Queue: React.FC = () => {
                 className="border border-gray-200 rounded-lg p-4 hover:shadow-md transition-shadow"
               >
                 <div className="mb-3 w-1/2 aspect-video bg-gray-100 rounded overflow-hidden">
-                  {isInstagramReels(item.video_url) ? (
+                  {item.thumbnail_hash && item.thumbnail_sizes.length > 0 ? (
+                    <img
+                      src={thumbnailVariantUrl(item.thumbnail_hash, item.thumbnail_sizes[0])}
+                      srcSet={item.thumbnail_sizes
+                        .map((width) => `${thumbnailVariantUrl(item.thumbnail_hash!, width)} ${width}w`)
+                        .join(', ')}
+                      sizes="(min-width: 1024px) 200px, 50vw"
+                      alt={item.title || 'Video thumbnail'}
+                      loading="lazy"
+                      className="w-full h-full object-contain"
+                      onError={(e) => {
+                        // Fall back to the original thumbnail if a cached variant is missing
+                        const img = e.target as HTMLImageElement;
+                        if (item.thumbnail_url && img.src !== item.thumbnail_url) {
+                          img.removeAttribute('srcset');
+                          img.src = item.thumbnail_url;
+                        } else {
+                          img.style.display = 'none';
+                        }
+                      }}
+                    />
+                  ) : isInstagramReels(item.video_url) ? (
                     <div className="w-full h-full flex flex-col items-center justify-center bg-gradient-to-br from-purple-600 via-pink-600 to-orange-600">
                       <svg className="w-12 h-12 text-white mb-2" fill="currentColor" viewBox="0 0 24 24">
                         <path d="M12.823 1l2.974 5.002h-5.58l-2.65-4.971c.206-.013.419-.022.642-.027L8.55 1zm2.327 0h.298c3.06 0 4.468.754 5.64 1.887a6.007 6.007 0 011.596 2.82l.07.295h-4.629L15.15 1zm-9.667.377L7.95 6.002H1.244a6.01 6.01 0 013.942-4.53zm9.735 12.834l-4.545-2.624a.909.909 0 00-1.356.668l-.008.12v5.248a.91.91 0 001.255.84l.109-.053 4.545-2.624a.909.909 0 00.1-1.507l-.1-.068-4.545-2.624-4.545 2.624zm-11.954-9.09h7.66l-.67 1.393h-6.372a6.03 6.03 0 00-.618-1.393zm.019 1.916h6.133L8.11 8.943h-5.43a6.007 6.007 0 00.166-1.906zm7.142 1.914l-.67 1.393h-5.64a6.031 6.031 0 00-.376-1.393zm.022 1.916l-.67 1.394H5.86a6.031 6.031 0 00-.117-1.394h4.31zm-.065 1.916l-.67 1.393H4.307a6.012 6.012 0 00.246-1.393zm-5.012 1.916h3.84l-.67 1.394H2.26a6.012 6.012 0 00.783-1.394zm10.334 1.916a5.963 5.963 0 01-5.94 5.937 5.96 5.96 0 01-5.94-5.937h11.88z"/>
@@ -165,6 +192,7 @@ const Queue: React.FC = () => {
                     <img
                       src={item.thumbnail_url}
                       alt={item.title || 'Video thumbnail'}
+                      loading="lazy"
                       className="w-full h-full object-contain"
                       onError={(e) => {
                         (e.target as HTMLImageElement).style.display = 'none';
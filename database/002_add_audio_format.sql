@@ -0,0 +1,30 @@
+-- Migration: Record output audio format and bitrate
+-- Date: 2026-10-19
+-- Description: Add audio_format and audio_bitrate columns so each completed row
+--              records whether the native stream was kept (e.g. m4a) or re-encoded (e.g. mp3)
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_name = 'audio_queue'
+        AND column_name = 'audio_format'
+    ) THEN
+        ALTER TABLE audio_queue
+        ADD COLUMN audio_format VARCHAR(20);
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_name = 'audio_queue'
+        AND column_name = 'audio_bitrate'
+    ) THEN
+        ALTER TABLE audio_queue
+        ADD COLUMN audio_bitrate INTEGER;
+    END IF;
+END $$;
+
+COMMENT ON COLUMN audio_queue.audio_format IS 'Container/codec of the downloaded audio file (NULL for video downloads)';
+COMMENT ON COLUMN audio_queue.audio_bitrate IS 'Audio bitrate in kbps';
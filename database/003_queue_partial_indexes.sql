@@ -0,0 +1,14 @@
+-- migrate:no-transaction
+-- Migration: Partial indexes for the worker's hot queries
+-- Date: 2026-10-19
+-- Description: get_next_pending and get_active_download only look at live rows,
+--              so index just those. Built CONCURRENTLY to avoid locking audio_queue
+--              while the workers are running.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audio_queue_pending_created_at
+    ON audio_queue (created_at)
+    WHERE status = 'pending';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audio_queue_downloading
+    ON audio_queue (started_at)
+    WHERE status = 'downloading';
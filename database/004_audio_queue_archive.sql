@@ -0,0 +1,34 @@
+-- migrate:no-transaction
+-- Migration: Archive table for finished queue rows
+-- Date: 2026-10-19
+-- Description: Completed and failed rows are moved out of audio_queue by the
+--              youtube-service archiver, so the live table (its indexes and the
+--              updated_at trigger) only holds work in progress and recent results.
+--              Lookups by video_id check both tables.
+
+CREATE TABLE IF NOT EXISTS audio_queue_archive (
+    id INTEGER PRIMARY KEY,
+    video_url VARCHAR(500) NOT NULL,
+    video_id VARCHAR(100) NOT NULL UNIQUE,
+    title VARCHAR(500),
+    channel_name VARCHAR(200),
+    duration INTEGER,
+    thumbnail_url TEXT,
+    status VARCHAR(50) NOT NULL,
+    file_path VARCHAR(1000),
+    error_message TEXT,
+    audio_format VARCHAR(20),
+    audio_bitrate INTEGER,
+    created_at TIMESTAMP,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_audio_queue_archive_archived_at ON audio_queue_archive(archived_at);
+
+-- Lets the archiver find finished rows without scanning live work
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audio_queue_finished_updated_at
+    ON audio_queue (updated_at)
+    WHERE status IN ('completed', 'failed');
@@ -0,0 +1,10 @@
+-- Migration: Request trace id
+-- Date: 2026-10-19
+-- Description: Store the trace id of the request that queued each video, so the
+--              worker's spans join the Telegram bot and API spans of the same request.
+--              Adding a nullable column without a default does not rewrite the table.
+
+ALTER TABLE audio_queue ADD COLUMN IF NOT EXISTS trace_id VARCHAR(32);
+ALTER TABLE audio_queue_archive ADD COLUMN IF NOT EXISTS trace_id VARCHAR(32);
+
+COMMENT ON COLUMN audio_queue.trace_id IS 'Trace id (X-Trace-Id header) of the request that last queued the video';
@@ -0,0 +1,12 @@
+-- Migration: Thumbnail cache
+-- Date: 2026-10-19
+-- Description: youtube-service downloads each remote thumbnail once and stores
+--              resized variants on disk under their content hash. Kept in its own
+--              table so caching never updates (and re-triggers) audio_queue rows.
+
+CREATE TABLE IF NOT EXISTS thumbnail_cache (
+    video_id VARCHAR(100) PRIMARY KEY,
+    content_hash CHAR(64) NOT NULL,
+    source_url TEXT NOT NULL,
+    fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
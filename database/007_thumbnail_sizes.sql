@@ -0,0 +1,7 @@
+-- Migration: Widths stored per cached thumbnail
+-- Date: 2026-10-19
+-- Description: The API advertises the variants that were actually generated for a
+--              thumbnail instead of the currently configured THUMBNAIL_SIZES.
+--              Existing rows start empty and are backfilled by youtube-service.
+
+ALTER TABLE thumbnail_cache ADD COLUMN IF NOT EXISTS sizes INTEGER[] NOT NULL DEFAULT '{}';
@@ -3,12 +3,34 @@
 Database migration script for PostgreSQL.
 Runs SQL files from ../database folder in order.
 Tracks applied migrations in a migrations table.
+
+Migrations run with a lock_timeout so they never queue behind (and block)
+the workers for long; on a lock timeout they are retried with backoff.
+A file can change how it is applied with header directives:
+
+    -- migrate:no-transaction        run each statement separately in autocommit
+                                     (required for CREATE INDEX CONCURRENTLY)
+    -- migrate:lock-timeout=5s       override MIGRATION_LOCK_TIMEOUT
+    -- migrate:statement-timeout=1h  override MIGRATION_STATEMENT_TIMEOUT
+    -- migrate:retries=10            override MIGRATION_RETRIES
+
+In no-transaction files a statement preceded by "-- migrate:batch" is a
+backfill step: it is re-run, committing after each run, until it affects no
+rows, so it should touch a bounded chunk (e.g. "... WHERE id IN (SELECT ...
+LIMIT 1000)").
+
+A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+IF NOT EXISTS would then skip. Before each attempt such a leftover is
+dropped, and the file is only recorded once all of its indexes are valid.
 """
 
 import os
+import re
 import sys
 import glob
+import time
 import psycopg2
+import psycopg2.errors
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -26,6 +48,25 @@ DB_CONFIG = {
 
 MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'database')
 
+# Online migration settings (PostgreSQL interval syntax, '0' disables)
+LOCK_TIMEOUT = os.getenv('MIGRATION_LOCK_TIMEOUT', '5s')
+STATEMENT_TIMEOUT = os.getenv('MIGRATION_STATEMENT_TIMEOUT', '0')
+RETRIES = int(os.getenv('MIGRATION_RETRIES', '5'))
+RETRY_DELAY = float(os.getenv('MIGRATION_RETRY_DELAY', '2'))
+BATCH_PAUSE = float(os.getenv('MIGRATION_BATCH_PAUSE', '0.1'))
+
+DIRECTIVE_RE = re.compile(r'^--\s*migrate:([a-z-]+)(?:=(\S+))?\s*$', re.MULTILINE)
+BATCH_RE = re.compile(r'^--\s*migrate:batch\s*$', re.MULTILINE)
+DOLLAR_TAG_RE = re.compile(r'\$[A-Za-z_]*\$')
+CONCURRENT_INDEX_RE = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?("[^"]+"|[\w.]+)',
+    re.IGNORECASE
+)
+
+
+class MigrationError(Exception):
+    """Migration ran but left the database in a state it must not be recorded in."""
+
 
 def get_connection():
     """Create database connection."""
@@ -48,6 +89,8 @@ def ensure_migrations_table(conn):
                 applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        cur.execute("ALTER TABLE _migrations ADD COLUMN IF NOT EXISTS duration_ms INTEGER")
+        cur.execute("ALTER TABLE _migrations ADD COLUMN IF NOT EXISTS attempts INTEGER")
     conn.commit()
 
 
@@ -72,6 +115,160 @@ def get_pending_migrations(applied):
     return pending
 
 
+def parse_directives(sql):
+    """Read "-- migrate:key[=value]" options from a migration file."""
+    options = {
+        'no-transaction': False,
+        'lock-timeout': LOCK_TIMEOUT,
+        'statement-timeout': STATEMENT_TIMEOUT,
+        'retries': RETRIES,
+    }
+    for key, value in DIRECTIVE_RE.findall(sql):
+        if key == 'no-transaction':
+            options[key] = True
+        elif key == 'retries':
+            options[key] = int(value)
+        elif key in options and value:
+            options[key] = value
+    return options
+
+
+def split_statements(sql):
+    """Split SQL into statements, respecting quotes, dollar quotes and comments."""
+    statements = []
+    start = 0
+    i = 0
+    length = len(sql)
+
+    while i < length:
+        ch = sql[i]
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = length if end == -1 else end + 1
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+        elif ch == "'" or ch == '"':
+            end = sql.find(ch, i + 1)
+            while end != -1 and sql.startswith(ch * 2, end):
+                end = sql.find(ch, end + 2)
+            i = length if end == -1 else end + 1
+        elif ch == '$' and DOLLAR_TAG_RE.match(sql, i):
+            tag = DOLLAR_TAG_RE.match(sql, i).group(0)
+            end = sql.find(tag, i + len(tag))
+            i = length if end == -1 else end + len(tag)
+        elif ch == ';':
+            statements.append(sql[start:i + 1])
+            start = i + 1
+            i += 1
+        else:
+            i += 1
+
+    statements.append(sql[start:])
+
+    # Drop chunks that only contain whitespace and comments
+    def has_code(statement):
+        stripped = re.sub(r'--[^\n]*|/\*.*?\*/', '', statement, flags=re.DOTALL)
+        return stripped.strip(' \t\r\n;') != ''
+
+    return [statement.strip() for statement in statements if has_code(statement)]
+
+
+def set_timeouts(cur, options, local):
+    scope = 'LOCAL ' if local else ''
+    cur.execute(f"SET {scope}lock_timeout = %s", (options['lock-timeout'],))
+    cur.execute(f"SET {scope}statement_timeout = %s", (options['statement-timeout'],))
+
+
+def with_retries(options, action):
+    """Run action(), retrying with backoff when a lock could not be acquired in time."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            action()
+            return attempt
+        except psycopg2.errors.LockNotAvailable as e:
+            if attempt > options['retries']:
+                raise
+            delay = RETRY_DELAY * 2 ** (attempt - 1)
+            print(f"\n    Lock timeout ({str(e).strip()}), retry {attempt}/{options['retries']} in {delay:.0f}s...", end=' ')
+            time.sleep(delay)
+
+
+def is_invalid_index(cur, name):
+    cur.execute("""
+        SELECT NOT i.indisvalid FROM pg_index i
+        WHERE i.indexrelid = to_regclass(%s)
+    """, (name,))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def drop_invalid_index(cur, name):
+    """Drop an index left INVALID by an interrupted CREATE INDEX CONCURRENTLY."""
+    if is_invalid_index(cur, name):
+        print(f"\n    Dropping invalid index {name}", end=' ')
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def run_in_transaction(conn, sql, options):
+    """Apply the whole file atomically."""
+    def attempt():
+        try:
+            with conn.cursor() as cur:
+                set_timeouts(cur, options, local=True)
+                cur.execute(sql)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+
+    return with_retries(options, attempt)
+
+
+def run_without_transaction(conn, sql, options):
+    """Apply statements one by one in autocommit, repeating batch steps until done."""
+    attempts = 0
+    indexes = []
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            set_timeouts(cur, options, local=False)
+
+            for statement in split_statements(sql):
+                if BATCH_RE.search(statement):
+                    total = 0
+                    while True:
+                        attempts += with_retries(options, lambda: cur.execute(statement))
+                        if cur.rowcount <= 0:
+                            break
+                        total += cur.rowcount
+                        time.sleep(BATCH_PAUSE)
+                    print(f"\n    Backfilled {total} row(s)", end=' ')
+                elif CONCURRENT_INDEX_RE.search(statement):
+                    index = CONCURRENT_INDEX_RE.search(statement).group(1)
+                    indexes.append(index)
+
+                    def build_index():
+                        drop_invalid_index(cur, index)
+                        cur.execute(statement)
+
+                    attempts += with_retries(options, build_index)
+                else:
+                    attempts += with_retries(options, lambda: cur.execute(statement))
+
+            invalid = [index for index in indexes if is_invalid_index(cur, index)]
+            if invalid:
+                raise MigrationError(f"Invalid index(es) after migration: {', '.join(invalid)}")
+
+            cur.execute("RESET lock_timeout")
+            cur.execute("RESET statement_timeout")
+    finally:
+        conn.autocommit = False
+    return attempts
+
+
 def apply_migration(conn, filename, filepath):
     """Apply a single migration file."""
     print(f"  Applying: {filename}...", end=' ')
@@ -79,17 +276,25 @@ def apply_migration(conn, filename, filepath):
     with open(filepath, 'r', encoding='utf-8') as f:
         sql = f.read()
 
+    options = parse_directives(sql)
+    started = time.monotonic()
+
     try:
+        if options['no-transaction']:
+            attempts = run_without_transaction(conn, sql, options)
+        else:
+            attempts = run_in_transaction(conn, sql, options)
+
+        duration_ms = int((time.monotonic() - started) * 1000)
         with conn.cursor() as cur:
-            cur.execute(sql)
             cur.execute(
-                "INSERT INTO _migrations (filename) VALUES (%s)",
-                (filename,)
+                "INSERT INTO _migrations (filename, duration_ms, attempts) VALUES (%s, %s, %s)",
+                (filename, duration_ms, attempts)
             )
         conn.commit()
-        print("OK")
+        print(f"OK ({duration_ms} ms)")
         return True
-    except psycopg2.Error as e:
+    except (psycopg2.Error, MigrationError) as e:
         conn.rollback()
         print(f"FAILED\n    Error: {e}")
         return False
@@ -0,0 +1,149 @@
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = 'X-Trace-Id'
+TRACE_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+# Spans buffered for the writer thread; beyond this new spans are dropped
+MAX_PENDING_SPANS = 10000
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def is_valid_trace_id(value: Optional[str]) -> bool:
+    """Whether value has the format new_trace_id() produces"""
+    return bool(value and TRACE_ID_RE.match(value))
+
+
+def new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Tracer:
+    """Writes spans as JSON lines (OTLP field names) to a local file.
+
+    Disabled when no file is configured, so tracing costs nothing by default.
+    Spans are appended by a background thread, so recording one never blocks
+    the event loop on file I/O.
+    """
+
+    def __init__(self, service: str, path: Optional[str]):
+        self.service = service
+        self.path = path
+        self._queue: queue.Queue = queue.Queue(maxsize=MAX_PENDING_SPANS)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    def configure(self, service: str):
+        """Name this process's spans; TRACE_SERVICE_NAME takes precedence"""
+        self.service = os.getenv('TRACE_SERVICE_NAME') or service
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='trace-writer', daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _write_loop(self):
+        while True:
+            lines = [self._queue.get()]
+            # Drain everything already waiting so a burst becomes one write
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in lines
+            lines = [line for line in lines if line is not None]
+            if lines:
+                try:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(''.join(lines))
+                except Exception as e:
+                    logger.warning(f"Failed to export {len(lines)} span(s): {str(e)}")
+            if stop:
+                return
+
+    def close(self):
+        """Write out queued spans and stop the writer thread"""
+        if self._writer:
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+
+    def record(
+        self,
+        name: str,
+        trace_id: Optional[str],
+        start: float,
+        end: float,
+        parent_span_id: Optional[str] = None,
+        span_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> Optional[str]:
+        """Export a finished span; start and end are Unix timestamps in seconds"""
+        if not self.path or not trace_id:
+            return None
+
+        span = {
+            'traceId': trace_id,
+            'spanId': span_id or new_span_id(),
+            'parentSpanId': parent_span_id,
+            'name': name,
+            'service': self.service,
+            'startTimeUnixNano': int(start * 1e9),
+            'endTimeUnixNano': int(end * 1e9),
+            'durationMs': round((end - start) * 1000, 3),
+            'attributes': attributes or {},
+            'status': {'code': 'ERROR', 'message': error} if error else {'code': 'OK'},
+        }
+        if self._writer is None:
+            self._start_writer()
+        try:
+            self._queue.put_nowait(json.dumps(span, default=str) + '\n')
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped == 1 or self._dropped % 1000 == 0:
+                logger.warning(f"Trace writer is behind, dropped {self._dropped} span(s)")
+        except Exception as e:
+            logger.warning(f"Failed to export span {name}: {str(e)}")
+        return span['spanId']
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str], parent_span_id: Optional[str] = None, **attributes):
+        """Time the enclosed block; yields the span ID for child spans"""
+        span_id = new_span_id()
+        start = time.time()
+        error = None
+        try:
+            yield span_id
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            self.record(
+                name, trace_id, start, time.time(),
+                parent_span_id=parent_span_id,
+                span_id=span_id,
+                attributes=attributes,
+                error=error
+            )
+
+
+# Process-wide tracer; each service names itself with tracer.configure()
+tracer = Tracer(os.getenv('TRACE_SERVICE_NAME', 'unknown'), os.getenv('TRACE_FILE'))
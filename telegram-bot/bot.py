@@ -1,13 +1,27 @@
 import os
+import sys
+import hmac
+import time
+import hashlib
+import shutil
 import asyncio
 import logging
-from typing import Optional
+from typing import Optional, Dict, List, Tuple
 import aiohttp
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# tracing.py is shared with youtube-service: the Docker image copies it next to
+# this file, from a source checkout it is found in the repository's shared/ folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+
+from media import prepare_delivery
+from tracing import tracer, new_trace_id, TRACE_HEADER
+
+tracer.configure('telegram-bot')
+
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
@@ -16,13 +30,141 @@ logger = logging.getLogger(__name__)
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 YOUTUBE_SERVICE_URL = os.getenv('YOUTUBE_SERVICE_URL', 'http://localhost:3001')
+# Externally reachable youtube-service URL for files too large to upload
+PUBLIC_SERVICE_URL = os.getenv('PUBLIC_SERVICE_URL')
+# Signs those links; must match FILE_LINK_SECRET of youtube-service
+FILE_LINK_SECRET = os.getenv('FILE_LINK_SECRET')
+FILE_LINK_TTL = int(os.getenv('FILE_LINK_TTL', '86400'))
+
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.opus', '.ogg')
+
+# Concurrency limits
+MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', '10'))
+MAX_JOBS_PER_CHAT = int(os.getenv('MAX_JOBS_PER_CHAT', '2'))
+MAX_QUEUED_JOBS = int(os.getenv('MAX_QUEUED_JOBS', '100'))
+MAX_CONCURRENT_POLLS = int(os.getenv('MAX_CONCURRENT_POLLS', '5'))
+MAX_CONCURRENT_UPLOADS = int(os.getenv('MAX_CONCURRENT_UPLOADS', '3'))
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '64'))
+
+
+class ConcurrencyLimiter:
+    """Bounds running jobs globally and per chat, plus polling and upload stages"""
+
+    def __init__(
+        self,
+        max_jobs: int,
+        max_jobs_per_chat: int,
+        max_queued: int,
+        max_polls: int,
+        max_uploads: int
+    ):
+        self.max_jobs = max_jobs
+        self.max_jobs_per_chat = max_jobs_per_chat
+        self.max_queued = max_queued
+        self.polls = asyncio.Semaphore(max_polls)
+        self.uploads = asyncio.Semaphore(max_uploads)
+        self._active = 0
+        self._active_per_chat: Dict[int, int] = {}
+        self._waiting: List[Tuple[int, object]] = []
+        # Jobs per chat accepted by a handler whose task has not reached acquire() yet
+        self._reserved: Dict[int, int] = {}
+        self._condition = asyncio.Condition()
+
+    def _can_start(self, chat_id: int) -> bool:
+        return (
+            self._active < self.max_jobs
+            and self._active_per_chat.get(chat_id, 0) < self.max_jobs_per_chat
+        )
+
+    def _is_next(self, chat_id: int, ticket: object) -> bool:
+        # FIFO among waiters that are able to start, so a chat at its own
+        # limit does not block other chats queued behind it
+        if not self._can_start(chat_id):
+            return False
+        for waiting_chat_id, waiting_ticket in self._waiting:
+            if waiting_ticket is ticket:
+                return True
+            if self._can_start(waiting_chat_id):
+                return False
+        return False
+
+    def _pending(self) -> int:
+        return len(self._waiting) + sum(self._reserved.values())
+
+    def _is_ahead_of(self, waiting_chat_id: int, chat_id: int) -> bool:
+        # A waiter held back only by its own chat's limit does not delay other
+        # chats (see _is_next), but does delay later jobs from the same chat
+        return (
+            waiting_chat_id == chat_id
+            or self._active_per_chat.get(waiting_chat_id, 0) < self.max_jobs_per_chat
+        )
+
+    def reserve(self, chat_id: int) -> Optional[int]:
+        """Accept a new job and return its queue position (0 if it can start now).
+
+        Returns None when the wait queue is full. Every reservation must be
+        followed by acquire() or cancel_reservation().
+        """
+        if self._pending() >= self.max_queued:
+            return None
+        ahead = sum(1 for waiting_chat_id, _ in self._waiting if self._is_ahead_of(waiting_chat_id, chat_id))
+        ahead += sum(
+            count for reserved_chat_id, count in self._reserved.items()
+            if self._is_ahead_of(reserved_chat_id, chat_id)
+        )
+        position = 0 if not ahead and self._can_start(chat_id) else ahead + 1
+        self._reserved[chat_id] = self._reserved.get(chat_id, 0) + 1
+        return position
+
+    def cancel_reservation(self, chat_id: int):
+        remaining = self._reserved.get(chat_id, 0) - 1
+        if remaining > 0:
+            self._reserved[chat_id] = remaining
+        else:
+            self._reserved.pop(chat_id, None)
+
+    async def acquire(self, chat_id: int):
+        """Wait for a slot; consumes the reservation made by reserve()"""
+        self.cancel_reservation(chat_id)
+        async with self._condition:
+            ticket = object()
+            self._waiting.append((chat_id, ticket))
+            try:
+                await self._condition.wait_for(lambda: self._is_next(chat_id, ticket))
+            finally:
+                self._waiting.remove((chat_id, ticket))
+            self._active += 1
+            self._active_per_chat[chat_id] = self._active_per_chat.get(chat_id, 0) + 1
+            self._condition.notify_all()
+
+    async def release(self, chat_id: int):
+        async with self._condition:
+            self._active -= 1
+            remaining = self._active_per_chat.get(chat_id, 0) - 1
+            if remaining > 0:
+                self._active_per_chat[chat_id] = remaining
+            else:
+                self._active_per_chat.pop(chat_id, None)
+            self._condition.notify_all()
 
 
 class VideoDownloaderBot:
     def __init__(self, token: str, service_url: str):
         self.token = token
         self.service_url = service_url
-        self.application = Application.builder().token(token).build()
+        self.limiter = ConcurrencyLimiter(
+            max_jobs=MAX_CONCURRENT_JOBS,
+            max_jobs_per_chat=MAX_JOBS_PER_CHAT,
+            max_queued=MAX_QUEUED_JOBS,
+            max_polls=MAX_CONCURRENT_POLLS,
+            max_uploads=MAX_CONCURRENT_UPLOADS
+        )
+        self.application = (
+            Application.builder()
+            .token(token)
+            .concurrent_updates(MAX_CONCURRENT_UPDATES)
+            .build()
+        )
 
     async def start(self, update, context):
         await update.message.reply_text(
@@ -40,19 +182,21 @@ class VideoDownloaderBot:
             "2. Жди пока я скачаю\n"
             "3. Получи файл!\n\n"
             "Поддерживаются:\n"
-            "• YouTube (скачивается аудио в MP3)\n"
+            "• YouTube (скачивается аудио)\n"
             "• Instagram посты и Reels (скачивается видео)\n\n"
             "Команды:\n"
             "/start - Начать работу\n"
             "/help - Показать эту справку"
         )
 
-    async def add_to_queue(self, url: str) -> Optional[dict]:
+    async def add_to_queue(self, url: str, trace_id: Optional[str] = None) -> Optional[dict]:
+        headers = {TRACE_HEADER: trace_id} if trace_id else None
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.post(
                     f'{self.service_url}/api/videos',
-                    json={'url': url}
+                    json={'url': url},
+                    headers=headers
                 ) as response:
                     if response.status == 200:
                         return await response.json()
@@ -80,7 +224,8 @@ class VideoDownloaderBot:
     async def wait_for_download(self, video_id: str, max_wait: int = 300) -> Optional[dict]:
         waited = 0
         while waited < max_wait:
-            status = await self.get_video_status(video_id)
+            async with self.limiter.polls:
+                status = await self.get_video_status(video_id)
             if not status:
                 return None
 
@@ -97,15 +242,58 @@ class VideoDownloaderBot:
     async def handle_url(self, update, context):
         url = update.message.text.strip()
 
-        if not ('youtube.com' in url or 'youtu.be' in url or 'instagram.com' in url):
+        # Only weed out text that is not a link at all; youtube-service decides
+        # which hosts are supported and answers 400 for the rest
+        if not url or any(c.isspace() for c in url) or '.' not in url:
             await update.message.reply_text(
                 "❌ Пожалуйста, отправь корректную ссылку на YouTube или Instagram"
             )
             return
 
-        status_message = await update.message.reply_text("⏳ Добавляю в очередь на скачивание...")
+        chat_id = update.effective_chat.id
+        position = self.limiter.reserve(chat_id)
+        if position is None:
+            await update.message.reply_text("🚦 Бот сейчас перегружен. Попробуй через пару минут.")
+            return
+
+        try:
+            if position:
+                status_message = await update.message.reply_text(
+                    f"🕒 Ожидаю свободный слот... Позиция в очереди: {position}"
+                )
+            else:
+                status_message = await update.message.reply_text("⏳ Добавляю в очередь на скачивание...")
+        except BaseException:
+            self.limiter.cancel_reservation(chat_id)
+            raise
+
+        # The job outlives the handler, so the update slot is free for the next message
+        context.application.create_task(
+            self.run_job(update, url, chat_id, position, status_message),
+            update=update
+        )
 
-        result = await self.add_to_queue(url)
+    async def run_job(self, update, url: str, chat_id: int, position: int, status_message):
+        # One trace per message, passed to youtube-service and stored on the queue row
+        trace_id = new_trace_id()
+        logger.info(f"Handling {url} (trace {trace_id})")
+
+        with tracer.span('bot.handle_url', trace_id, chat_id=chat_id, url=url) as root_span:
+            with tracer.span('bot.slot_wait', trace_id, root_span, position=position):
+                await self.limiter.acquire(chat_id)
+            try:
+                if position:
+                    await status_message.edit_text("⏳ Добавляю в очередь на скачивание...")
+                await self.process_url(update, url, status_message, trace_id, root_span)
+            except Exception as e:
+                logger.error(f"Job for {url} failed: {e}", exc_info=True)
+                await status_message.edit_text("❌ Произошла ошибка при обработке. Попробуй позже.")
+            finally:
+                await self.limiter.release(chat_id)
+
+    async def process_url(self, update, url: str, status_message, trace_id: str, parent_span_id: str):
+        with tracer.span('bot.add_to_queue', trace_id, parent_span_id):
+            result = await self.add_to_queue(url, trace_id)
         if not result:
             await status_message.edit_text("❌ Не удалось добавить видео в очередь. Проверь ссылку и попробуй снова.")
             return
@@ -113,7 +301,8 @@ class VideoDownloaderBot:
         video_id = result['video_id']
         await status_message.edit_text(f"✅ Добавлено в очередь!\n⬇️ Скачиваю... (ID: {video_id})")
 
-        final_status = await self.wait_for_download(video_id, max_wait=300)
+        with tracer.span('bot.wait_for_download', trace_id, parent_span_id, video_id=video_id):
+            final_status = await self.wait_for_download(video_id, max_wait=300)
 
         if not final_status:
             await status_message.edit_text("⏰ Превышено время ожидания. Попробуй позже.")
@@ -141,32 +330,25 @@ class VideoDownloaderBot:
             await status_message.edit_text("❌ Файл не найден на сервере")
             return
 
+        is_audio = bool(final_status.get('audio_format')) or file_path.endswith(AUDIO_EXTENSIONS)
+        title = final_status.get('title') or 'Downloaded file'
+
         logger.info(f"File size: {os.path.getsize(file_path)} bytes")
-        await status_message.edit_text("📤 Отправляю файл...")
+        with tracer.span('bot.prepare_delivery', trace_id, parent_span_id, video_id=video_id):
+            delivery = await prepare_delivery(file_path, final_status.get('duration'), is_audio)
 
         try:
-            is_audio = file_path.endswith('.mp3')
-            title = final_status.get('title', 'Downloaded file')
-
-            logger.info(f"Sending {'audio' if is_audio else 'video'} file: {title}")
-
-            if is_audio:
-                with open(file_path, 'rb') as audio_file:
-                    await update.message.reply_audio(
-                        audio=audio_file,
-                        title=title,
-                        performer=final_status.get('channel_name', 'Unknown'),
-                        read_timeout=120,
-                        write_timeout=120
-                    )
-            else:
-                with open(file_path, 'rb') as video_file:
-                    await update.message.reply_video(
-                        video=video_file,
-                        caption=title,
-                        read_timeout=120,
-                        write_timeout=120
-                    )
+            if delivery['strategy'] == 'link':
+                await self.send_link(update, status_message, video_id, title)
+                return
+
+            await status_message.edit_text("📤 Отправляю файл...")
+            with tracer.span(
+                'bot.upload', trace_id, parent_span_id,
+                video_id=video_id, parts=len(delivery['files']),
+                bytes=sum(os.path.getsize(f) for f in delivery['files'])
+            ):
+                await self.send_files(update, delivery['files'], is_audio, title, final_status)
 
             logger.info("File sent successfully")
             await status_message.delete()
@@ -175,6 +357,52 @@ class VideoDownloaderBot:
         except Exception as e:
             logger.error(f"Error sending file: {e}", exc_info=True)
             await status_message.edit_text(f"❌ Ошибка при отправке файла: {str(e)}")
+        finally:
+            if delivery['temp_dir']:
+                shutil.rmtree(delivery['temp_dir'], ignore_errors=True)
+
+    async def send_files(self, update, files: List[str], is_audio: bool, title: str, final_status: dict):
+        logger.info(f"Sending {'audio' if is_audio else 'video'} file: {title} ({len(files)} part(s))")
+
+        for index, part_path in enumerate(files, start=1):
+            part_title = title if len(files) == 1 else f"{title} ({index}/{len(files)})"
+
+            async with self.limiter.uploads:
+                if is_audio:
+                    with open(part_path, 'rb') as audio_file:
+                        await update.message.reply_audio(
+                            audio=audio_file,
+                            title=part_title,
+                            performer=final_status.get('channel_name', 'Unknown'),
+                            read_timeout=120,
+                            write_timeout=120
+                        )
+                else:
+                    with open(part_path, 'rb') as video_file:
+                        await update.message.reply_video(
+                            video=video_file,
+                            caption=part_title,
+                            read_timeout=120,
+                            write_timeout=120
+                        )
+
+    def file_link(self, video_id: str) -> str:
+        """Download link for youtube-service, valid for FILE_LINK_TTL seconds"""
+        expires = int(time.time()) + FILE_LINK_TTL
+        token = hmac.new(
+            FILE_LINK_SECRET.encode(), f"{video_id}:{expires}".encode(), hashlib.sha256
+        ).hexdigest()
+        return f"{PUBLIC_SERVICE_URL}/api/videos/{video_id}/file?expires={expires}&token={token}"
+
+    async def send_link(self, update, status_message, video_id: str, title: str):
+        if not PUBLIC_SERVICE_URL or not FILE_LINK_SECRET:
+            await status_message.edit_text("❌ Файл слишком большой для отправки в Telegram")
+            return
+
+        await status_message.edit_text(
+            f"📦 Файл слишком большой для Telegram.\n"
+            f"🔗 {title}: {self.file_link(video_id)}"
+        )
 
     def run(self):
         self.application.add_handler(CommandHandler("start", self.start))
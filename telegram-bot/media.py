@@ -0,0 +1,142 @@
+import os
+import math
+import glob
+import asyncio
+import logging
+import tempfile
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Telegram Bot API rejects uploads above 50 MB
+TELEGRAM_UPLOAD_LIMIT = int(os.getenv('TELEGRAM_UPLOAD_LIMIT', str(50 * 1024 * 1024)))
+MIN_AUDIO_BITRATE_KBPS = int(os.getenv('MIN_AUDIO_BITRATE_KBPS', '48'))
+MIN_VIDEO_BITRATE_KBPS = int(os.getenv('MIN_VIDEO_BITRATE_KBPS', '250'))
+VIDEO_AUDIO_BITRATE_KBPS = 64
+MAX_PARTS = int(os.getenv('MAX_PARTS', '10'))
+
+# Leave headroom for container overhead and bitrate overshoot
+SIZE_SAFETY_FACTOR = 0.9
+
+
+def plan_delivery(
+    file_size: int,
+    duration: Optional[int],
+    is_audio: bool,
+    limit: int = TELEGRAM_UPLOAD_LIMIT
+) -> Dict[str, Any]:
+    """Decide how to deliver a file from its size and duration, before uploading anything"""
+    if file_size <= limit:
+        return {'strategy': 'send'}
+
+    if not duration:
+        # Without a duration we can neither pick a bitrate nor cut by time
+        return {'strategy': 'link'}
+
+    budget_kbps = int(limit * 8 * SIZE_SAFETY_FACTOR / duration / 1000)
+    min_kbps = MIN_AUDIO_BITRATE_KBPS if is_audio else MIN_VIDEO_BITRATE_KBPS + VIDEO_AUDIO_BITRATE_KBPS
+    if budget_kbps >= min_kbps:
+        return {'strategy': 'transcode', 'bitrate_kbps': budget_kbps}
+
+    parts = math.ceil(file_size / (limit * SIZE_SAFETY_FACTOR))
+    if parts <= MAX_PARTS:
+        return {
+            'strategy': 'split',
+            'parts': parts,
+            # Rounding up keeps the cut at most `parts` segments long
+            'segment_seconds': max(1, math.ceil(duration / parts))
+        }
+
+    return {'strategy': 'link'}
+
+
+async def run_ffmpeg(*args: str):
+    """Run ffmpeg and raise on a non-zero exit code"""
+    process = await asyncio.create_subprocess_exec(
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+
+async def transcode_to_fit(file_path: str, is_audio: bool, bitrate_kbps: int, output_dir: str) -> str:
+    """Re-encode a file to the given total bitrate"""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+
+    if is_audio:
+        output_path = os.path.join(output_dir, f'{name}.mp3')
+        await run_ffmpeg(
+            '-i', file_path, '-vn',
+            '-c:a', 'libmp3lame', '-b:a', f'{bitrate_kbps}k',
+            output_path
+        )
+    else:
+        video_kbps = bitrate_kbps - VIDEO_AUDIO_BITRATE_KBPS
+        output_path = os.path.join(output_dir, f'{name}.mp4')
+        await run_ffmpeg(
+            '-i', file_path,
+            '-c:v', 'libx264', '-preset', 'veryfast',
+            '-b:v', f'{video_kbps}k', '-maxrate', f'{video_kbps}k', '-bufsize', f'{video_kbps * 2}k',
+            '-c:a', 'aac', '-b:a', f'{VIDEO_AUDIO_BITRATE_KBPS}k',
+            '-movflags', '+faststart',
+            output_path
+        )
+
+    return output_path
+
+
+async def split_by_duration(file_path: str, segment_seconds: int, output_dir: str) -> List[str]:
+    """Cut a file into time-based parts without re-encoding"""
+    name, ext = os.path.splitext(os.path.basename(file_path))
+    pattern = os.path.join(output_dir, f'{name}_part%03d{ext}')
+    await run_ffmpeg(
+        '-i', file_path,
+        '-f', 'segment', '-segment_time', str(segment_seconds),
+        '-c', 'copy', '-reset_timestamps', '1',
+        pattern
+    )
+    return sorted(glob.glob(os.path.join(output_dir, f'{name}_part*{ext}')))
+
+
+async def prepare_delivery(
+    file_path: str,
+    duration: Optional[int],
+    is_audio: bool,
+    limit: int = TELEGRAM_UPLOAD_LIMIT
+) -> Dict[str, Any]:
+    """Build the list of files to upload, or fall back to a link.
+
+    Returns the plan extended with 'files' (paths to send) and 'temp_dir'
+    (to be removed by the caller once the files are sent).
+    """
+    file_size = os.path.getsize(file_path)
+    plan = plan_delivery(file_size, duration, is_audio, limit)
+    plan.update({'files': [], 'temp_dir': None})
+    logger.info(f"Delivery plan for {file_path} ({file_size} bytes, {duration}s): {plan['strategy']}")
+
+    if plan['strategy'] == 'send':
+        plan['files'] = [file_path]
+        return plan
+    if plan['strategy'] == 'link':
+        return plan
+
+    plan['temp_dir'] = tempfile.mkdtemp(prefix='tgbot_')
+    try:
+        if plan['strategy'] == 'transcode':
+            files = [await transcode_to_fit(file_path, is_audio, plan['bitrate_kbps'], plan['temp_dir'])]
+        else:
+            files = await split_by_duration(file_path, plan['segment_seconds'], plan['temp_dir'])
+    except Exception as e:
+        logger.error(f"Failed to {plan['strategy']} {file_path}: {e}")
+        files = []
+
+    if not files or len(files) > MAX_PARTS or any(os.path.getsize(f) > limit for f in files):
+        logger.warning(f"Could not fit {file_path} under {limit} bytes, falling back to link")
+        plan['strategy'] = 'link'
+        return plan
+
+    plan['files'] = files
+    return plan
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class QueueArchiver:
+    """Background worker moving finished rows from audio_queue to audio_queue_archive"""
+
+    def __init__(
+        self,
+        db: Database,
+        retention: timedelta,
+        batch_size: int = 500,
+        interval: float = 300
+    ):
+        self.db = db
+        self.retention = retention
+        self.batch_size = batch_size
+        self.interval = interval
+
+    async def archive_once(self) -> int:
+        """Archive in batches until no eligible rows remain"""
+        total = 0
+        while True:
+            moved = await self.db.archive_finished(self.retention, self.batch_size)
+            total += moved
+            if moved < self.batch_size:
+                return total
+            # Yield between batches so the download worker is never starved
+            await asyncio.sleep(0.1)
+
+    async def run(self):
+        logger.info(f"Queue archiver started (retention: {self.retention}, batch: {self.batch_size})")
+
+        while True:
+            try:
+                archived = await self.archive_once()
+                if archived:
+                    logger.info(f"Archived {archived} finished video(s)")
+                await asyncio.sleep(self.interval)
+
+            except asyncio.CancelledError:
+                logger.info("Queue archiver cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in queue archiver: {str(e)}")
+                await asyncio.sleep(self.interval)
@@ -0,0 +1 @@
+"""Benchmarks for youtube-service. Run from the youtube-service directory: python -m benchmarks.<name>"""
@@ -0,0 +1,52 @@
+"""Check URL normalization against the corpus and time it.
+
+    python -m benchmarks.bench_urls [iterations]
+"""
+
+import sys
+import time
+
+from url_normalizer import normalize_url
+from benchmarks.url_corpus import URL_CORPUS
+
+
+def check_corpus() -> int:
+    failures = 0
+    for url, expected in URL_CORPUS:
+        result = normalize_url(url)
+        actual = (result.video_id, result.canonical_url) if result else None
+        if actual != expected:
+            failures += 1
+            print(f"FAIL {url!r}: expected {expected}, got {actual}")
+    print(f"Corpus: {len(URL_CORPUS) - failures}/{len(URL_CORPUS)} OK")
+    return failures
+
+
+def bench(iterations: int):
+    urls = [url for url, _ in URL_CORPUS]
+
+    normalize_url.cache_clear()
+    start = time.perf_counter()
+    for i in range(iterations):
+        for url in urls:
+            # Unique suffix defeats the LRU cache to measure parsing cost
+            normalize_url(f'{url}#{i}')
+    uncached = time.perf_counter() - start
+
+    normalize_url.cache_clear()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for url in urls:
+            normalize_url(url)
+    cached = time.perf_counter() - start
+
+    calls = iterations * len(urls)
+    print(f"Uncached: {uncached / calls * 1e6:.2f} us/url")
+    print(f"Cached:   {cached / calls * 1e6:.2f} us/url")
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    failed = check_corpus()
+    bench(iterations)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,63 @@
+"""Offline stand-in for yt_dlp.YoutubeDL.
+
+Sleeps for a configurable time instead of hitting the network and writes a
+small file where yt-dlp would, so the download worker runs end to end
+without external access.
+"""
+
+import os
+import time
+from typing import Any, Dict
+
+METADATA_DELAY = float(os.getenv('FAKE_METADATA_DELAY', '0.05'))
+DOWNLOAD_DELAY = float(os.getenv('FAKE_DOWNLOAD_DELAY', '0.5'))
+FILE_SIZE = int(os.getenv('FAKE_FILE_SIZE', str(64 * 1024)))
+
+
+class FakeYoutubeDL:
+    def __init__(self, params: Dict[str, Any] = None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def _info(self, url: str) -> Dict[str, Any]:
+        video_id = url.rstrip('/').split('=')[-1].split('/')[-1]
+        return {
+            'id': video_id,
+            'title': f'Benchmark {video_id}',
+            'uploader': 'Benchmark Channel',
+            'duration': 180,
+            'thumbnail': None,
+            'ext': 'm4a',
+            'vcodec': 'none',
+            'acodec': 'mp4a.40.2',
+            'abr': 128,
+        }
+
+    def extract_info(self, url: str, download: bool = True) -> Dict[str, Any]:
+        info = self._info(url)
+        if not download:
+            time.sleep(METADATA_DELAY)
+            return info
+
+        time.sleep(DOWNLOAD_DELAY)
+        file_path = self.params['outtmpl'].replace('%(ext)s', info['ext'])
+        with open(file_path, 'wb') as f:
+            f.write(b'\0' * FILE_SIZE)
+        info['requested_downloads'] = [{'filepath': file_path}]
+        return info
+
+    def download(self, urls):
+        for url in urls:
+            self.extract_info(url, download=True)
+        return 0
+
+
+def install():
+    """Replace yt-dlp in the downloader module with the fake"""
+    import downloader
+    downloader.yt_dlp.YoutubeDL = FakeYoutubeDL
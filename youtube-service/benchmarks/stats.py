@@ -0,0 +1,23 @@
+from typing import List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def report(name: str, values: List[float]):
+    """Print count and p50/p99/max in milliseconds"""
+    if not values:
+        print(f"{name:<36} n=0")
+        return
+    print(
+        f"{name:<36} n={len(values):<6} "
+        f"p50={percentile(values, 50) * 1000:8.1f}ms "
+        f"p99={percentile(values, 99) * 1000:8.1f}ms "
+        f"max={max(values) * 1000:8.1f}ms"
+    )
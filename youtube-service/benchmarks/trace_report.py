@@ -0,0 +1,70 @@
+"""Per-stage latency from span files written with TRACE_FILE.
+
+    python -m benchmarks.trace_report bot-traces.jsonl service-traces.jsonl
+    python -m benchmarks.trace_report traces.jsonl --trace <trace id>
+"""
+
+import sys
+import json
+import argparse
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.stats import report
+
+
+def load_spans(paths: List[str]) -> List[Dict]:
+    spans = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    spans.append(json.loads(line))
+    return spans
+
+
+def print_trace(spans: List[Dict], trace_id: str) -> int:
+    trace = sorted(
+        (span for span in spans if span['traceId'] == trace_id),
+        key=lambda span: span['startTimeUnixNano']
+    )
+    if not trace:
+        print(f"Trace {trace_id} not found")
+        return 1
+
+    origin = trace[0]['startTimeUnixNano']
+    for span in trace:
+        offset_ms = (span['startTimeUnixNano'] - origin) / 1e6
+        status = '' if span['status']['code'] == 'OK' else f"  ERROR: {span['status'].get('message')}"
+        print(
+            f"+{offset_ms:10.1f}ms  {span['durationMs']:10.1f}ms  "
+            f"{span['service']:<16} {span['name']}{status}"
+        )
+    return 0
+
+
+def print_percentiles(spans: List[Dict]) -> int:
+    durations = defaultdict(list)
+    for span in spans:
+        durations[f"{span['service']}:{span['name']}"].append(span['durationMs'] / 1000)
+
+    for name in sorted(durations):
+        report(name, durations[name])
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='span files (JSON lines)')
+    parser.add_argument('--trace', help='print the timeline of a single trace')
+    args = parser.parse_args()
+
+    spans = load_spans(args.files)
+    if args.trace:
+        sys.exit(print_trace(spans, args.trace))
+    sys.exit(print_percentiles(spans))
+
+
+if __name__ == '__main__':
+    main()
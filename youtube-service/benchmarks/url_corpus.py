@@ -0,0 +1,51 @@
+"""URL forms seen in production, with the expected (video_id, canonical_url).
+
+None means the URL must be rejected.
+"""
+
+YT = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+IG_REEL = 'https://www.instagram.com/reel/C1a2B3c4D5e/'
+IG_POST = 'https://www.instagram.com/p/C1a2B3c4D5e/'
+
+URL_CORPUS = [
+    # YouTube watch pages
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('http://youtube.com/watch?v=dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('youtube.com/watch?v=dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube.com/watch?feature=share&v=dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube.com/watch?list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs&index=2&v=dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&si=AbCdEfGhIjKlMnOp&pp=ygUEdGVzdA%3D%3D', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ#t=30', ('dQw4w9WgXcQ', YT)),
+    ('https://m.youtube.com/watch?v=dQw4w9WgXcQ&feature=youtu.be', ('dQw4w9WgXcQ', YT)),
+    ('https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RDAMVMdQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('  https://WWW.YouTube.com/watch?v=dQw4w9WgXcQ  ', ('dQw4w9WgXcQ', YT)),
+    # Short links
+    ('https://youtu.be/dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('https://youtu.be/dQw4w9WgXcQ?si=AbCdEfGhIjKlMnOp', ('dQw4w9WgXcQ', YT)),
+    ('https://youtu.be/dQw4w9WgXcQ?t=10', ('dQw4w9WgXcQ', YT)),
+    # Other YouTube layouts
+    ('https://www.youtube.com/shorts/dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('https://youtube.com/shorts/dQw4w9WgXcQ?feature=share', ('dQw4w9WgXcQ', YT)),
+    ('https://m.youtube.com/shorts/dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube.com/embed/dQw4w9WgXcQ?autoplay=1', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube.com/v/dQw4w9WgXcQ', ('dQw4w9WgXcQ', YT)),
+    ('https://www.youtube.com/live/dQw4w9WgXcQ?si=AbCdEfGhIjKlMnOp', ('dQw4w9WgXcQ', YT)),
+    # Instagram
+    ('https://www.instagram.com/reel/C1a2B3c4D5e/', ('ig_C1a2B3c4D5e', IG_REEL)),
+    ('https://www.instagram.com/reel/C1a2B3c4D5e', ('ig_C1a2B3c4D5e', IG_REEL)),
+    ('https://www.instagram.com/reels/C1a2B3c4D5e/', ('ig_C1a2B3c4D5e', IG_REEL)),
+    ('https://www.instagram.com/reel/C1a2B3c4D5e/?igsh=MWQ1ZGUxMzBkMA==', ('ig_C1a2B3c4D5e', IG_REEL)),
+    ('https://instagram.com/reel/C1a2B3c4D5e/?utm_source=ig_web_copy_link', ('ig_C1a2B3c4D5e', IG_REEL)),
+    ('https://www.instagram.com/some.user/reel/C1a2B3c4D5e/', ('ig_C1a2B3c4D5e', IG_REEL)),
+    ('https://www.instagram.com/p/C1a2B3c4D5e/', ('ig_C1a2B3c4D5e', IG_POST)),
+    ('https://www.instagram.com/p/C1a2B3c4D5e/?img_index=2', ('ig_C1a2B3c4D5e', IG_POST)),
+    # Rejected
+    ('https://www.youtube.com/', None),
+    ('https://www.youtube.com/watch?v=short', None),
+    ('https://www.youtube.com/@somechannel', None),
+    ('https://www.instagram.com/some.user/', None),
+    ('https://vimeo.com/123456', None),
+    ('not a url', None),
+]
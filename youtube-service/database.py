@@ -1,16 +1,192 @@
+import time
+import asyncio
 import asyncpg
 import logging
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable, Tuple
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Columns shared by audio_queue and audio_queue_archive
+QUEUE_COLUMNS = (
+    'id, video_url, video_id, title, channel_name, duration, thumbnail_url, '
+    'status, file_path, error_message, audio_format, audio_bitrate, '
+    'trace_id, created_at, started_at, completed_at, updated_at'
+)
+
+# Columns returned to API clients (QueueItem)
+API_COLUMNS = (
+    'id, video_url, video_id, title, channel_name, duration, thumbnail_url, '
+    'status, file_path, error_message, audio_format, audio_bitrate, '
+    'trace_id, created_at, started_at, completed_at'
+)
+
+# Cached thumbnail of a row, joined from thumbnail_cache
+THUMBNAIL_JOIN = 'LEFT JOIN thumbnail_cache USING (video_id)'
+THUMBNAIL_COLUMN = (
+    'thumbnail_cache.content_hash AS thumbnail_hash, '
+    'thumbnail_cache.sizes AS thumbnail_sizes'
+)
+
+# Columns the download worker needs to start a job; queue_wait is seconds
+# since the row became pending (updated_at is bumped on every transition)
+WORKER_COLUMNS = (
+    'id, video_id, video_url, title, trace_id, '
+    'EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - updated_at) AS queue_wait'
+)
+
+# Named statements. asyncpg prepares each distinct query once per connection
+# and reuses it from its statement cache, so keeping the text in one place
+# keeps every call on an already-prepared statement.
+STATEMENTS = {
+    'add_video': """
+        INSERT INTO audio_queue
+        (video_url, video_id, title, channel_name, duration, thumbnail_url, trace_id, status)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, 'pending')
+        RETURNING id, video_id, status, trace_id, created_at
+    """,
+    'get_video_by_video_id': f"""
+        SELECT {API_COLUMNS}, {THUMBNAIL_COLUMN}, FALSE AS archived
+        FROM audio_queue {THUMBNAIL_JOIN} WHERE video_id = $1
+        UNION ALL
+        SELECT {API_COLUMNS}, {THUMBNAIL_COLUMN}, TRUE AS archived
+        FROM audio_queue_archive {THUMBNAIL_JOIN} WHERE video_id = $1
+        ORDER BY archived
+        LIMIT 1
+    """,
+    'get_video_by_id': f"""
+        SELECT {API_COLUMNS}, {THUMBNAIL_COLUMN}, FALSE AS archived
+        FROM audio_queue {THUMBNAIL_JOIN} WHERE id = $1
+        UNION ALL
+        SELECT {API_COLUMNS}, {THUMBNAIL_COLUMN}, TRUE AS archived
+        FROM audio_queue_archive {THUMBNAIL_JOIN} WHERE id = $1
+        ORDER BY archived
+        LIMIT 1
+    """,
+    'restore_archived': f"""
+        WITH restored AS (
+            DELETE FROM audio_queue_archive WHERE video_id = $1
+            RETURNING {QUEUE_COLUMNS}
+        )
+        INSERT INTO audio_queue ({QUEUE_COLUMNS})
+        SELECT {QUEUE_COLUMNS} FROM restored
+        RETURNING {API_COLUMNS}, FALSE AS archived
+    """,
+    'archive_finished': f"""
+        WITH moved AS (
+            DELETE FROM audio_queue
+            WHERE id IN (
+                SELECT id FROM audio_queue
+                WHERE status IN ('completed', 'failed')
+                AND updated_at < CURRENT_TIMESTAMP - $1::interval
+                ORDER BY updated_at
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING {QUEUE_COLUMNS}
+        )
+        INSERT INTO audio_queue_archive ({QUEUE_COLUMNS})
+        SELECT {QUEUE_COLUMNS} FROM moved
+    """,
+    'get_queue': f"""
+        SELECT {API_COLUMNS}, {THUMBNAIL_COLUMN}
+        FROM audio_queue {THUMBNAIL_JOIN}
+        ORDER BY
+            CASE
+                WHEN status = 'downloading' THEN 1
+                WHEN status = 'pending' THEN 2
+                WHEN status = 'completed' THEN 3
+                ELSE 4
+            END,
+            created_at ASC
+        LIMIT $1
+    """,
+    'get_next_pending': f"""
+        SELECT {WORKER_COLUMNS} FROM audio_queue
+        WHERE status = 'pending'
+        ORDER BY created_at ASC
+        LIMIT 1
+    """,
+    # Rows without a cached thumbnail, or missing one of the widths in $3
+    'get_uncached_thumbnails': """
+        SELECT q.video_id, q.thumbnail_url
+        FROM audio_queue q
+        LEFT JOIN thumbnail_cache t USING (video_id)
+        WHERE (t.video_id IS NULL OR NOT t.sizes @> $3::int[])
+        AND q.thumbnail_url IS NOT NULL
+        AND NOT (q.video_id = ANY($1::varchar[]))
+        ORDER BY q.created_at DESC
+        LIMIT $2
+    """,
+    # Widths generated earlier for the same image stay on disk, so they are kept
+    'set_thumbnail': """
+        INSERT INTO thumbnail_cache (video_id, content_hash, source_url, sizes)
+        VALUES ($1, $2, $3, $4::int[])
+        ON CONFLICT (video_id) DO UPDATE
+        SET sizes = CASE
+                WHEN thumbnail_cache.content_hash = EXCLUDED.content_hash
+                THEN ARRAY(SELECT DISTINCT unnest(thumbnail_cache.sizes || EXCLUDED.sizes) ORDER BY 1)
+                ELSE EXCLUDED.sizes
+            END,
+            content_hash = EXCLUDED.content_hash,
+            source_url = EXCLUDED.source_url,
+            fetched_at = CURRENT_TIMESTAMP
+    """,
+    'get_active_download': """
+        SELECT id, video_id FROM audio_queue WHERE status = 'downloading' LIMIT 1
+    """,
+    # Single statement for every transition: only the columns that belong to
+    # the target status change, the rest keep their current values
+    'update_status': f"""
+        UPDATE audio_queue
+        SET status = $2::varchar,
+            started_at = CASE WHEN $2::varchar = 'downloading' THEN $3 ELSE started_at END,
+            completed_at = CASE WHEN $2::varchar = 'completed' THEN $3 ELSE completed_at END,
+            file_path = CASE WHEN $2::varchar = 'completed' THEN $4 ELSE file_path END,
+            audio_format = CASE WHEN $2::varchar = 'completed' THEN $6 ELSE audio_format END,
+            audio_bitrate = CASE WHEN $2::varchar = 'completed' THEN $7 ELSE audio_bitrate END,
+            error_message = CASE WHEN $2::varchar = 'failed' THEN $5 ELSE error_message END,
+            trace_id = COALESCE($8, trace_id)
+        WHERE id = $1
+        RETURNING {API_COLUMNS}
+    """,
+}
+
+class PoolExhausted(Exception):
+    """Raised when no pooled connection frees up within the acquire timeout"""
+
+
+# Called with (statement name, duration in seconds) after every query
+QueryHook = Callable[[str, float], None]
+
+
+def pool_bounds(worker_concurrency: int, api_concurrency: int, background_tasks: int = 1) -> Tuple[int, int]:
+    """Pool size from the number of callers that can hold a connection at once.
+
+    Each download worker and background task holds at most one connection at a
+    time, and so does each concurrently handled API request.
+    """
+    min_size = worker_concurrency + background_tasks
+    max_size = min_size + api_concurrency
+    return min_size, max_size
+
 
 class Database:
     """Database management class for audio queue"""
 
-    def __init__(self, database_url: str):
+    def __init__(
+        self,
+        database_url: str,
+        min_size: int = 2,
+        max_size: int = 10,
+        query_hook: Optional[QueryHook] = None,
+        acquire_timeout: float = 5
+    ):
         self.database_url = database_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.query_hook = query_hook
+        self.acquire_timeout = acquire_timeout
         self.pool: Optional[asyncpg.Pool] = None
 
     async def connect(self):
@@ -18,11 +194,11 @@ class Database:
         try:
             self.pool = await asyncpg.create_pool(
                 self.database_url,
-                min_size=2,
-                max_size=10,
+                min_size=self.min_size,
+                max_size=self.max_size,
                 command_timeout=60
             )
-            logger.info("Database connection pool created")
+            logger.info(f"Database connection pool created ({self.min_size}-{self.max_size} connections)")
         except Exception as e:
             logger.error(f"Failed to connect to database: {str(e)}")
             raise
@@ -33,6 +209,29 @@ class Database:
             await self.pool.close()
             logger.info("Database connection pool closed")
 
+    async def _run(self, method: str, name: str, *args):
+        started = time.perf_counter()
+        try:
+            try:
+                conn = await self.pool.acquire(timeout=self.acquire_timeout)
+            except asyncio.TimeoutError:
+                raise PoolExhausted(f"No database connection free within {self.acquire_timeout}s")
+            try:
+                return await getattr(conn, method)(STATEMENTS[name], *args)
+            finally:
+                await self.pool.release(conn)
+        finally:
+            if self.query_hook:
+                self.query_hook(name, time.perf_counter() - started)
+
+    async def _fetchrow(self, name: str, *args) -> Optional[Dict[str, Any]]:
+        row = await self._run('fetchrow', name, *args)
+        return dict(row) if row else None
+
+    async def _fetch(self, name: str, *args) -> List[Dict[str, Any]]:
+        rows = await self._run('fetch', name, *args)
+        return [dict(row) for row in rows]
+
     async def add_video(
         self,
         video_url: str,
@@ -40,118 +239,65 @@ class Database:
         title: Optional[str] = None,
         channel_name: Optional[str] = None,
         duration: Optional[int] = None,
-        thumbnail_url: Optional[str] = None
+        thumbnail_url: Optional[str] = None,
+        trace_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Add a new video to the queue"""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                """
-                INSERT INTO audio_queue
-                (video_url, video_id, title, channel_name, duration, thumbnail_url, status)
-                VALUES ($1, $2, $3, $4, $5, $6, 'pending')
-                RETURNING id, video_id, status, created_at
-                """,
-                video_url, video_id, title, channel_name, duration, thumbnail_url
-            )
-            return dict(row)
+        return await self._fetchrow(
+            'add_video',
+            video_url, video_id, title, channel_name, duration, thumbnail_url, trace_id
+        )
 
     async def get_video_by_video_id(self, video_id: str) -> Optional[Dict[str, Any]]:
-        """Get video by YouTube video ID"""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT * FROM audio_queue WHERE video_id = $1",
-                video_id
-            )
-            return dict(row) if row else None
+        """Get video by YouTube video ID, from the live queue or the archive"""
+        return await self._fetchrow('get_video_by_video_id', video_id)
 
     async def get_video_by_id(self, id: int) -> Optional[Dict[str, Any]]:
-        """Get video by database ID"""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT * FROM audio_queue WHERE id = $1",
-                id
-            )
-            return dict(row) if row else None
+        """Get video by database ID, from the live queue or the archive"""
+        return await self._fetchrow('get_video_by_id', id)
+
+    async def restore_archived(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """Move an archived video back into the live queue"""
+        return await self._fetchrow('restore_archived', video_id)
+
+    async def archive_finished(self, older_than: timedelta, batch_size: int) -> int:
+        """Move up to batch_size completed/failed rows older than older_than to the archive"""
+        result = await self._run('execute', 'archive_finished', older_than, batch_size)
+        # Status string is "INSERT 0 <count>"
+        return int(result.split()[-1])
 
     async def get_queue(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get all videos in queue, ordered by creation time"""
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(
-                """
-                SELECT * FROM audio_queue
-                ORDER BY
-                    CASE
-                        WHEN status = 'downloading' THEN 1
-                        WHEN status = 'pending' THEN 2
-                        WHEN status = 'completed' THEN 3
-                        ELSE 4
-                    END,
-                    created_at ASC
-                LIMIT $1
-                """,
-                limit
-            )
-            return [dict(row) for row in rows]
+        return await self._fetch('get_queue', limit)
 
     async def get_next_pending(self) -> Optional[Dict[str, Any]]:
         """Get the next pending video in queue"""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                """
-                SELECT * FROM audio_queue
-                WHERE status = 'pending'
-                ORDER BY created_at ASC
-                LIMIT 1
-                """
-            )
-            return dict(row) if row else None
+        return await self._fetchrow('get_next_pending')
 
     async def update_status(
         self,
         id: int,
         status: str,
         file_path: Optional[str] = None,
-        error_message: Optional[str] = None
-    ):
-        """Update video status"""
-        async with self.pool.acquire() as conn:
-            if status == 'downloading':
-                await conn.execute(
-                    """
-                    UPDATE audio_queue
-                    SET status = $1, started_at = $2
-                    WHERE id = $3
-                    """,
-                    status, datetime.utcnow(), id
-                )
-            elif status == 'completed':
-                await conn.execute(
-                    """
-                    UPDATE audio_queue
-                    SET status = $1, file_path = $2, completed_at = $3
-                    WHERE id = $4
-                    """,
-                    status, file_path, datetime.utcnow(), id
-                )
-            elif status == 'failed':
-                await conn.execute(
-                    """
-                    UPDATE audio_queue
-                    SET status = $1, error_message = $2
-                    WHERE id = $3
-                    """,
-                    status, error_message, id
-                )
-            else:
-                await conn.execute(
-                    "UPDATE audio_queue SET status = $1 WHERE id = $2",
-                    status, id
-                )
+        error_message: Optional[str] = None,
+        audio_format: Optional[str] = None,
+        audio_bitrate: Optional[int] = None,
+        trace_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Update video status and return the updated row"""
+        return await self._fetchrow(
+            'update_status',
+            id, status, datetime.utcnow(), file_path, error_message, audio_format, audio_bitrate, trace_id
+        )
+
+    async def get_uncached_thumbnails(self, exclude: List[str], sizes: List[int], limit: int) -> List[Dict[str, Any]]:
+        """Get rows with a remote thumbnail that is not cached yet in all of the given widths"""
+        return await self._fetch('get_uncached_thumbnails', exclude, limit, sizes)
+
+    async def set_thumbnail(self, video_id: str, content_hash: str, source_url: str, sizes: List[int]):
+        """Record the cached thumbnail of a video and the widths generated for it"""
+        await self._run('execute', 'set_thumbnail', video_id, content_hash, source_url, sizes)
 
     async def get_active_download(self) -> Optional[Dict[str, Any]]:
         """Get currently downloading video"""
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT * FROM audio_queue WHERE status = 'downloading' LIMIT 1"
-            )
-            return dict(row) if row else None
+        return await self._fetchrow('get_active_download')
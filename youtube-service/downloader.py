@@ -1,61 +1,89 @@
 import os
 import re
+import time
 import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import yt_dlp
 
 from database import Database
+from executors import BoundedExecutor, ExecutorSaturated
+from tracing import tracer
+from url_normalizer import NormalizedUrl, normalize_url
 
 logger = logging.getLogger(__name__)
 
 
+UNSAFE_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+AUDIO_POLICY_NATIVE = 'native'
+AUDIO_POLICY_TRANSCODE = 'transcode'
+
+# Accepted audio format (file extension) -> prefix of the yt-dlp acodec it holds.
+# YouTube serves opus inside webm, so the codec decides whether a stream can
+# be kept and the container is fixed with a remux
+AUDIO_FORMAT_CODECS = {
+    'm4a': 'mp4a',
+    'mp3': 'mp3',
+    'opus': 'opus',
+    'ogg': 'vorbis',
+}
+
+
 class YouTubeDownloader:
     """YouTube audio downloader with queue processing"""
 
-    def __init__(self, db: Database, download_path: str):
+    def __init__(
+        self,
+        db: Database,
+        download_path: str,
+        audio_policy: str = AUDIO_POLICY_NATIVE,
+        accepted_audio_formats: Optional[List[str]] = None,
+        transcode_codec: str = 'mp3',
+        transcode_bitrate: int = 192,
+        metadata_executor: Optional[BoundedExecutor] = None,
+        download_executor: Optional[BoundedExecutor] = None,
+        io_executor: Optional[BoundedExecutor] = None
+    ):
         self.db = db
         self.download_path = download_path
         self.is_processing = False
+        # 'native' keeps the source audio stream when its codec is accepted by
+        # clients (remuxing it if needed) and only re-encodes otherwise;
+        # 'transcode' always re-encodes
+        self.audio_policy = audio_policy
+        self.accepted_audio_formats = accepted_audio_formats or ['m4a', 'mp3']
+        self.transcode_codec = transcode_codec
+        self.transcode_bitrate = transcode_bitrate
+        # Metadata lookups serve API requests and must not wait behind downloads
+        self.metadata_executor = metadata_executor or BoundedExecutor('metadata', 4)
+        self.download_executor = download_executor or BoundedExecutor('download', 1)
+        # Directory scans and deletes in the download path, off the event loop
+        self.io_executor = io_executor or BoundedExecutor('io', 2)
 
         # Create download directory if it doesn't exist
         os.makedirs(download_path, exist_ok=True)
 
+    def normalize_url(self, url: str) -> Optional[NormalizedUrl]:
+        """Resolve URL to platform, video ID and canonical URL"""
+        return normalize_url(url)
+
     def extract_video_id(self, url: str) -> Optional[str]:
         """Extract video ID from URL (YouTube, Instagram, etc.)"""
-        # Check for Instagram content (Reels, Posts, etc.)
-        if self.is_instagram_reels(url):
-            # Extract Instagram content ID
-            instagram_patterns = [
-                r'instagram\.com/reels?/([^/?#]+)',
-                r'instagram\.com/p/([^/?#]+)',
-            ]
-            for pattern in instagram_patterns:
-                match = re.search(pattern, url)
-                if match:
-                    return f"ig_{match.group(1)}"
-            # If no pattern matches, use hash of URL
-            import hashlib
-            return f"ig_{hashlib.md5(url.encode()).hexdigest()[:12]}"
-
-        # YouTube patterns
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([^&\n?#]+)',
-            r'youtube\.com\/embed\/([^&\n?#]+)',
-            r'youtube\.com\/v\/([^&\n?#]+)'
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return None
+        normalized = normalize_url(url)
+        return normalized.video_id if normalized else None
 
     def is_instagram_reels(self, url: str) -> bool:
         """Check if URL is Instagram content (Reels, Posts, etc.)"""
-        return 'instagram.com' in url and ('/reel' in url or '/p/' in url or '/reels/' in url)
-
-    async def fetch_metadata(self, url: str) -> Dict[str, Any]:
+        normalized = normalize_url(url)
+        return bool(normalized) and normalized.platform == 'instagram'
+
+    async def fetch_metadata(
+        self,
+        url: str,
+        trace_id: Optional[str] = None,
+        parent_span_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Fetch video metadata without downloading"""
         try:
             ydl_opts = {
@@ -64,9 +92,9 @@ class YouTubeDownloader:
                 'skip_download': True,
             }
 
-            loop = asyncio.get_event_loop()
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await loop.run_in_executor(None, lambda: ydl.extract_info(url, download=False))
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl, \
+                    tracer.span('ytdlp.metadata', trace_id, parent_span_id, url=url):
+                info = await self.metadata_executor.run(ydl.extract_info, url, False)
 
             return {
                 'title': info.get('title'),
@@ -74,51 +102,156 @@ class YouTubeDownloader:
                 'duration': info.get('duration'),
                 'thumbnail': info.get('thumbnail'),
             }
+        except ExecutorSaturated:
+            raise
         except Exception as e:
             logger.error(f"Error fetching metadata: {str(e)}")
             return {}
 
-    async def download_audio(self, video_id: str, video_url: str, title: str) -> str:
-        """Download audio from YouTube video"""
+    def _audio_format_selector(self) -> str:
+        """Prefer audio streams whose codec is accepted, in order of preference"""
+        if self.audio_policy != AUDIO_POLICY_NATIVE:
+            return 'bestaudio/best'
+        preferred = [
+            f'bestaudio[acodec^={AUDIO_FORMAT_CODECS[fmt]}]'
+            for fmt in self.accepted_audio_formats
+            if fmt in AUDIO_FORMAT_CODECS
+        ]
+        return '/'.join(preferred + ['bestaudio', 'best'])
+
+    def _accepted_format_for(self, acodec: Optional[str]) -> Optional[str]:
+        """Accepted format that can hold the acodec without re-encoding"""
+        for fmt in self.accepted_audio_formats:
+            codec = AUDIO_FORMAT_CODECS.get(fmt)
+            if codec and acodec and acodec.lower().startswith(codec):
+                return fmt
+        return None
+
+    async def _run_ffmpeg_audio(self, source_path: str, output_ext: str, codec_args: List[str]) -> str:
+        """Write the audio stream of source_path to a new file, then remove the source"""
+        output_path = f'{os.path.splitext(source_path)[0]}.{output_ext}'
+        if output_path == source_path:
+            output_path = f'{os.path.splitext(source_path)[0]}.out.{output_ext}'
+
+        process = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+            '-i', source_path, '-vn', *codec_args,
+            output_path,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise Exception(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+        await self.io_executor.run(os.remove, source_path)
+        return output_path
+
+    def _find_download(self, video_id: str, file_path: Optional[str] = None) -> Optional[str]:
+        """The path yt-dlp reported if it exists, else the first file named after the video"""
+        if file_path and os.path.exists(file_path):
+            return file_path
+        for file in os.listdir(self.download_path):
+            if file.startswith(video_id):
+                return os.path.join(self.download_path, file)
+        return None
+
+    async def _remux_audio(self, source_path: str, audio_format: str) -> str:
+        """Copy the audio stream into the container of audio_format"""
+        return await self._run_ffmpeg_audio(source_path, audio_format, ['-c:a', 'copy'])
+
+    async def _transcode_audio(self, source_path: str) -> str:
+        """Re-encode a downloaded file to the configured codec and bitrate"""
+        return await self._run_ffmpeg_audio(
+            source_path, self.transcode_codec, ['-b:a', f'{self.transcode_bitrate}k']
+        )
+
+    async def download_audio(
+        self,
+        video_id: str,
+        video_url: str,
+        title: str,
+        trace_id: Optional[str] = None,
+        parent_span_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Download audio from YouTube video.
+
+        Returns the file path together with the audio format and bitrate (kbps)
+        that ended up on disk.
+        """
         # Sanitize filename
-        safe_title = re.sub(r'[<>:"/\\|?*]', '', title)[:100]
+        safe_title = UNSAFE_FILENAME_RE.sub('', title)[:100]
         output_template = os.path.join(self.download_path, f'{video_id}_{safe_title}.%(ext)s')
 
         ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': output_template,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',   # можно: mp3, m4a, wav, flac
-            'preferredquality': '192',
-        }],
-        'quiet': False,
+            'format': self._audio_format_selector(),
+            'outtmpl': output_template,
+            'quiet': False,
         }
 
         try:
-            loop = asyncio.get_event_loop()
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                await loop.run_in_executor(None, lambda: ydl.download([video_url]))
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl, \
+                    tracer.span('ytdlp.download', trace_id, parent_span_id, video_id=video_id, kind='audio'):
+                info = await self.download_executor.run(ydl.extract_info, video_url, True)
 
             # Find the downloaded file
-            expected_file = os.path.join(self.download_path, f'{video_id}_{safe_title}.mp3')
-            if os.path.exists(expected_file):
-                return expected_file
-            else:
-                # Try to find any file matching the video_id
-                for file in os.listdir(self.download_path):
-                    if file.startswith(video_id):
-                        return os.path.join(self.download_path, file)
+            downloads = info.get('requested_downloads') or []
+            reported_path = downloads[0].get('filepath') if downloads else None
+            file_path = await self.io_executor.run(self._find_download, video_id, reported_path)
+            if not file_path:
                 raise Exception("Downloaded file not found")
 
+            source_format = os.path.splitext(file_path)[1].lstrip('.').lower()
+            acodec = info.get('acodec')
+            native_format = self._accepted_format_for(acodec)
+            if (
+                self.audio_policy == AUDIO_POLICY_NATIVE
+                and native_format
+                and info.get('vcodec') in (None, 'none')
+            ):
+                if source_format != native_format:
+                    logger.info(f"Remuxing {video_id} {acodec} from {source_format} to {native_format}")
+                    with tracer.span(
+                        'ffmpeg.remux', trace_id, parent_span_id,
+                        video_id=video_id, source_format=source_format, audio_format=native_format
+                    ):
+                        file_path = await self._remux_audio(file_path, native_format)
+
+                bitrate = info.get('abr')
+                logger.info(f"Kept native {acodec} audio for {video_id} as {native_format} ({bitrate} kbps)")
+                return {
+                    'file_path': file_path,
+                    'audio_format': native_format,
+                    'audio_bitrate': int(bitrate) if bitrate else None,
+                }
+
+            logger.info(f"Transcoding {video_id} from {acodec} to {self.transcode_codec}")
+            with tracer.span(
+                'ffmpeg.transcode', trace_id, parent_span_id,
+                video_id=video_id, source_format=source_format, acodec=acodec, codec=self.transcode_codec
+            ):
+                file_path = await self._transcode_audio(file_path)
+            return {
+                'file_path': file_path,
+                'audio_format': self.transcode_codec,
+                'audio_bitrate': self.transcode_bitrate,
+            }
+
         except Exception as e:
             logger.error(f"Error downloading video {video_id}: {str(e)}")
             raise
 
-    async def download_video(self, video_id: str, video_url: str, title: str) -> str:
+    async def download_video(
+        self,
+        video_id: str,
+        video_url: str,
+        title: str,
+        trace_id: Optional[str] = None,
+        parent_span_id: Optional[str] = None
+    ) -> str:
         """Download video (for Instagram posts, Reels, TikTok, etc.)"""
         # Sanitize filename
-        safe_title = re.sub(r'[<>:"/\\|?*]', '', title)[:100]
+        safe_title = UNSAFE_FILENAME_RE.sub('', title)[:100]
         output_template = os.path.join(self.download_path, f'{video_id}_{safe_title}.%(ext)s')
 
         ydl_opts = {
@@ -128,15 +261,15 @@ class YouTubeDownloader:
         }
 
         try:
-            loop = asyncio.get_event_loop()
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                await loop.run_in_executor(None, lambda: ydl.download([video_url]))
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl, \
+                    tracer.span('ytdlp.download', trace_id, parent_span_id, video_id=video_id, kind='video'):
+                await self.download_executor.run(ydl.download, [video_url])
 
             # Find the downloaded file
-            for file in os.listdir(self.download_path):
-                if file.startswith(video_id):
-                    return os.path.join(self.download_path, file)
-            raise Exception("Downloaded file not found")
+            file_path = await self.io_executor.run(self._find_download, video_id)
+            if not file_path:
+                raise Exception("Downloaded file not found")
+            return file_path
 
         except Exception as e:
             logger.error(f"Error downloading video {video_id}: {str(e)}")
@@ -167,26 +300,41 @@ class YouTubeDownloader:
                 video_url = next_video['video_url']
                 title = next_video['title'] or 'Unknown Title'
 
+                trace_id = next_video['trace_id']
+
                 logger.info(f"Starting download: {video_id} - {title}")
 
+                # Time spent pending, measured by the database clock
+                picked_at = time.time()
+                tracer.record(
+                    'worker.queue_wait', trace_id,
+                    picked_at - float(next_video['queue_wait'] or 0), picked_at,
+                    attributes={'video_id': video_id}
+                )
+
                 # Update status to downloading
                 await self.db.update_status(next_video['id'], 'downloading')
 
                 try:
-                    # Check if it's Instagram content - download video instead of audio
-                    if self.is_instagram_reels(video_url):
-                        logger.info(f"Detected Instagram content, downloading video: {video_id}")
-                        file_path = await self.download_video(video_id, video_url, title)
-                    else:
-                        # Download the audio for YouTube and other sources
-                        file_path = await self.download_audio(video_id, video_url, title)
-
-                    # Update status to completed
-                    await self.db.update_status(
-                        next_video['id'],
-                        'completed',
-                        file_path=file_path
-                    )
+                    with tracer.span('worker.job', trace_id, video_id=video_id) as job_span:
+                        audio = {}
+                        # Check if it's Instagram content - download video instead of audio
+                        if self.is_instagram_reels(video_url):
+                            logger.info(f"Detected Instagram content, downloading video: {video_id}")
+                            file_path = await self.download_video(video_id, video_url, title, trace_id, job_span)
+                        else:
+                            # Download the audio for YouTube and other sources
+                            audio = await self.download_audio(video_id, video_url, title, trace_id, job_span)
+                            file_path = audio['file_path']
+
+                        # Update status to completed
+                        await self.db.update_status(
+                            next_video['id'],
+                            'completed',
+                            file_path=file_path,
+                            audio_format=audio.get('audio_format'),
+                            audio_bitrate=audio.get('audio_bitrate')
+                        )
 
                     logger.info(f"Download completed: {video_id} -> {file_path}")
 
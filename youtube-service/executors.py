@@ -0,0 +1,126 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a bounded executor already has max_queue jobs waiting"""
+
+
+class BoundedExecutor:
+    """Named thread pool with its own size, an optional wait-queue limit and load counters.
+
+    Each kind of blocking work (API metadata lookups, downloads, file I/O) gets
+    its own pool, so a backlog in one cannot starve the others.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _wrap(self, fn: Callable, args, state: Dict[str, bool]) -> Callable:
+        def job():
+            with self._lock:
+                # Already uncounted by run() if the caller was cancelled while waiting
+                if not state['abandoned']:
+                    self._queued -= 1
+                state['started'] = True
+                self._active += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+        return job
+
+    async def run(self, fn: Callable, *args):
+        """Run a blocking callable in this pool"""
+        with self._lock:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(f"{self.name} executor saturated ({self._queued} jobs waiting)")
+            self._queued += 1
+
+        state = {'started': False, 'abandoned': False}
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._wrap(fn, args, state))
+        except asyncio.CancelledError:
+            with self._lock:
+                if not state['started']:
+                    state['abandoned'] = True
+                    self._queued -= 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'name': self.name,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'active': self._active,
+                'queued': self._queued,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag: how late a sleep(interval) wakes up"""
+
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.2, window: int = 600):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._samples = deque(maxlen=window)
+        self._max = 0.0
+
+    async def run(self):
+        logger.info(f"Event loop lag monitor started (interval: {self.interval}s)")
+
+        while True:
+            try:
+                expected = time.perf_counter() + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.perf_counter() - expected)
+
+                self._samples.append(lag)
+                self._max = max(self._max, lag)
+                if lag >= self.warn_threshold:
+                    logger.warning(f"Event loop lag: {lag * 1000:.0f} ms")
+
+            except asyncio.CancelledError:
+                logger.info("Event loop lag monitor cancelled")
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {'samples': 0}
+
+        def pct(value: float) -> float:
+            return round(samples[min(len(samples) - 1, int(len(samples) * value))] * 1000, 2)
+
+        return {
+            'samples': len(samples),
+            'last_ms': round(self._samples[-1] * 1000, 2),
+            'p50_ms': pct(0.5),
+            'p99_ms': pct(0.99),
+            'max_ms': round(self._max * 1000, 2),
+        }
@@ -0,0 +1,138 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+import urllib.request
+from typing import Optional, List, Set
+
+from database import Database
+from executors import BoundedExecutor
+
+logger = logging.getLogger(__name__)
+
+CONTENT_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+MAX_THUMBNAIL_BYTES = 5 * 1024 * 1024
+FETCH_TIMEOUT = 15
+# Variants generated under an earlier THUMBNAIL_SIZES stay servable, so any
+# width in this range is looked up on disk
+MAX_THUMBNAIL_WIDTH = 4096
+
+
+class ThumbnailCache:
+    """Fetches remote thumbnails once and stores resized JPEG variants on disk.
+
+    Files are content-addressed ({hash[:2]}/{hash}_{width}.jpg), so identical
+    images share storage and a variant never changes once written, which lets
+    the API serve them with immutable cache headers.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        cache_path: str,
+        sizes: List[int],
+        batch_size: int = 20,
+        interval: float = 30,
+        fetch_executor: Optional[BoundedExecutor] = None,
+        io_executor: Optional[BoundedExecutor] = None
+    ):
+        self.db = db
+        self.cache_path = cache_path
+        self.sizes = sorted(sizes)
+        self.batch_size = batch_size
+        self.interval = interval
+        # Remote fetches can take up to FETCH_TIMEOUT, so they get their own pool
+        # instead of queueing ahead of the file operations on the io pool
+        self.fetch_executor = fetch_executor or BoundedExecutor('thumbnail', 2)
+        self.io_executor = io_executor or BoundedExecutor('io', 2)
+        # Video IDs whose thumbnail could not be fetched; skipped until restart
+        self._failed: Set[str] = set()
+        self._wake = asyncio.Event()
+
+        os.makedirs(cache_path, exist_ok=True)
+
+    def variant_path(self, content_hash: str, width: int) -> Optional[str]:
+        """Path of a cached variant, or None if the hash or width is not valid"""
+        if not CONTENT_HASH_RE.match(content_hash) or not 0 < width <= MAX_THUMBNAIL_WIDTH:
+            return None
+        return os.path.join(self.cache_path, content_hash[:2], f'{content_hash}_{width}.jpg')
+
+    def wake(self):
+        """Process new thumbnails now instead of at the next interval"""
+        self._wake.set()
+
+    def _download(self, url: str) -> bytes:
+        request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            data = response.read(MAX_THUMBNAIL_BYTES + 1)
+        if len(data) > MAX_THUMBNAIL_BYTES:
+            raise Exception(f"Thumbnail larger than {MAX_THUMBNAIL_BYTES} bytes")
+        return data
+
+    def _missing_widths(self, content_hash: str) -> List[int]:
+        """Configured widths without a file yet; creates the hash's directory"""
+        os.makedirs(os.path.join(self.cache_path, content_hash[:2]), exist_ok=True)
+        return [
+            width for width in self.sizes
+            if not os.path.exists(self.variant_path(content_hash, width))
+        ]
+
+    async def _resize(self, data: bytes, width: int, output_path: str):
+        """Scale down to width (never up) and encode as JPEG with ffmpeg"""
+        temp_path = f'{output_path}.tmp'
+        process = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+            '-i', 'pipe:0',
+            '-vf', f"scale='min({width},iw)':-2",
+            '-frames:v', '1', '-q:v', '4', '-f', 'mjpeg',
+            temp_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate(data)
+        if process.returncode != 0:
+            raise Exception(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+        await self.io_executor.run(os.replace, temp_path, output_path)
+
+    async def cache_thumbnail(self, video_id: str, url: str) -> str:
+        """Fetch, hash and resize one thumbnail; returns the content hash"""
+        data = await self.fetch_executor.run(self._download, url)
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        for width in await self.io_executor.run(self._missing_widths, content_hash):
+            await self._resize(data, width, self.variant_path(content_hash, width))
+
+        await self.db.set_thumbnail(video_id, content_hash, url, self.sizes)
+        return content_hash
+
+    async def cache_pending(self) -> int:
+        """Cache thumbnails for rows that do not have one yet, or miss a configured width"""
+        rows = await self.db.get_uncached_thumbnails(list(self._failed), self.sizes, self.batch_size)
+        for row in rows:
+            try:
+                await self.cache_thumbnail(row['video_id'], row['thumbnail_url'])
+            except Exception as e:
+                self._failed.add(row['video_id'])
+                logger.warning(f"Failed to cache thumbnail for {row['video_id']}: {str(e)}")
+        return len(rows)
+
+    async def run(self):
+        logger.info(f"Thumbnail cache started (path: {self.cache_path}, sizes: {self.sizes})")
+
+        while True:
+            try:
+                self._wake.clear()
+                if await self.cache_pending() < self.batch_size:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+                    except asyncio.TimeoutError:
+                        pass
+
+            except asyncio.CancelledError:
+                logger.info("Thumbnail cache cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in thumbnail cache: {str(e)}")
+                await asyncio.sleep(self.interval)
@@ -0,0 +1,103 @@
+import re
+import hashlib
+from functools import lru_cache
+from typing import Optional, NamedTuple, Callable, Dict, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+
+class NormalizedUrl(NamedTuple):
+    """Canonical form of a supported media URL"""
+    platform: str
+    video_id: str
+    canonical_url: str
+
+
+YOUTUBE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+# /shorts/ID, /embed/ID, /v/ID, /e/ID, /live/ID
+YOUTUBE_PATH_RE = re.compile(r'^/(?:shorts|embed|v|e|live)/([A-Za-z0-9_-]{11})(?:[/?#]|$)')
+YOUTU_BE_PATH_RE = re.compile(r'^/([A-Za-z0-9_-]{11})(?:[/?#]|$)')
+# /reel/CODE, /reels/CODE, /p/CODE, /tv/CODE, optionally prefixed by /username
+INSTAGRAM_PATH_RE = re.compile(r'^/(?:[A-Za-z0-9_.]+/)?(reels?|p|tv)/([A-Za-z0-9_-]+)')
+
+# Host prefixes that point at the same content as the bare domain
+HOST_PREFIXES = ('www.', 'm.', 'music.', 'mobile.')
+
+
+def _youtube_canonical(video_id: str) -> NormalizedUrl:
+    return NormalizedUrl('youtube', video_id, f'https://www.youtube.com/watch?v={video_id}')
+
+
+def _normalize_youtube(path: str, query: str) -> Optional[NormalizedUrl]:
+    if path in ('/watch', '/watch/'):
+        # v may appear anywhere among the query parameters
+        for video_id in parse_qs(query).get('v', []):
+            if YOUTUBE_ID_RE.match(video_id):
+                return _youtube_canonical(video_id)
+        return None
+
+    match = YOUTUBE_PATH_RE.match(path)
+    if match:
+        return _youtube_canonical(match.group(1))
+    return None
+
+
+def _normalize_youtu_be(path: str, query: str) -> Optional[NormalizedUrl]:
+    match = YOUTU_BE_PATH_RE.match(path)
+    if match:
+        return _youtube_canonical(match.group(1))
+    return None
+
+
+def _normalize_instagram(path: str, query: str) -> Optional[NormalizedUrl]:
+    match = INSTAGRAM_PATH_RE.match(path)
+    if match:
+        kind, code = match.groups()
+        kind = 'reel' if kind.startswith('reel') else kind
+        return NormalizedUrl('instagram', f'ig_{code}', f'https://www.instagram.com/{kind}/{code}/')
+
+    if '/reel' not in path and '/p/' not in path:
+        return None
+
+    # Unknown post layout: key it on the URL without query string and fragment
+    stripped = f'https://www.instagram.com{path.rstrip("/")}/'
+    return NormalizedUrl('instagram', f'ig_{hashlib.md5(stripped.encode()).hexdigest()[:12]}', stripped)
+
+
+# Host (without HOST_PREFIXES) -> platform-specific normalizer
+PLATFORM_HANDLERS: Dict[str, Callable[[str, str], Optional[NormalizedUrl]]] = {
+    'youtube.com': _normalize_youtube,
+    'youtube-nocookie.com': _normalize_youtube,
+    'youtu.be': _normalize_youtu_be,
+    'instagram.com': _normalize_instagram,
+    'instagr.am': _normalize_instagram,
+}
+
+
+def _split_url(url: str) -> Tuple[str, str, str]:
+    url = url.strip()
+    if '://' not in url:
+        url = f'https://{url}'
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    return host, parts.path, parts.query
+
+
+@lru_cache(maxsize=4096)
+def normalize_url(url: str) -> Optional[NormalizedUrl]:
+    """Resolve a URL to its platform, video ID and canonical URL.
+
+    Returns None for unsupported hosts or URLs without a recognizable video ID.
+    """
+    try:
+        host, path, query = _split_url(url)
+    except ValueError:
+        return None
+
+    handler = PLATFORM_HANDLERS.get(host)
+    if not handler:
+        return None
+    return handler(path, query)